@@ -1,5 +1,6 @@
 import unittest
 import pretty_midi
+import numpy as np
 
 from tuttut import graph_utils
 from tuttut.theory import Note, Tuning
@@ -32,6 +33,9 @@ class TestGraphUtils(unittest.TestCase):
         p2 = (18, 4) #for 3 (18/6), 4 and 5 triangle
         self.assertEqual(fretboard.distance_between(p1, p2), 5) 
         
+        p2s = np.array([(1, 0), (0, 1), (18, 4)])
+        np.testing.assert_allclose(fretboard.distance_between_arr(np.array(p1), p2s), [1/6, 1, 5])
+        
     def test_get_fret_distance(self):
         fretboard = Fretboard(Tuning())
         
@@ -39,20 +43,57 @@ class TestGraphUtils(unittest.TestCase):
         
         self.assertAlmostEqual(fretboard.get_fret_distance(nfret=10), 285.20, places=1)
         
+        np.testing.assert_allclose(fretboard.get_fret_distance(np.arange(11))[[0, 10]], [0, 285.20], atol=0.05)
+        
     def test_get_notes_in_graph(self):
-        pass
+        fretboard = Fretboard(Tuning())
+        
+        options = fretboard.get_specific_note_options(Note(52))
+        self.assertSameNotes(options, [Note(52)] * 3)
+        self.assertEqual([fretboard.G.nodes[note]["pos"] for note in options], [(3, 2), (4, 7), (5, 12)])
+        
+        self.assertEqual(fretboard.get_specific_note_options(Note(30)), [])
     
     def test_build_path_graph(self):
-        pass
+        fretboard = Fretboard(Tuning())
+        note_arrays = fretboard.get_note_options([Note(52), Note(56)])
+        
+        path_graph = graph_utils.build_path_graph(fretboard.G, note_arrays)
+        
+        self.assertEqual(set(path_graph.nodes), set(note for note_array in note_arrays for note in note_array))
+        self.assertEqual(
+            set(path_graph.edges),
+            set(graph_utils.build_path_graph(fretboard.G, note_arrays, (fretboard.node_indices, fretboard.distances)).edges)
+        )
+        
+        for note, target, distance in path_graph.edges(data="distance"):
+            self.assertNotEqual(fretboard.positions[note][0], fretboard.positions[target][0])
+            self.assertLess(distance, 6)
     
     def test_is_edge_possible(self):
         pass
     
     def test_find_all_paths(self):
-        pass
-    
-    def test_is_path_already_checked(self):
-        pass
+        fretboard = Fretboard(Tuning())
+        
+        note_options = fretboard.get_note_options([Note(52), Note(56)])
+        fingerings = fretboard.get_possible_fingerings(note_options)
+        positions = [tuple(fretboard.G.nodes[note]["pos"] for note in fingering) for fingering in fingerings]
+        
+        self.assertEqual(len(fingerings), len(set(frozenset(fingering) for fingering in fingerings)))
+        self.assertIn(((2, 1), (3, 2)), positions)
+        
+        for fingering in positions:
+            self.assertEqual(list(fingering), sorted(fingering))
+            
+        #Open low E can't be reached from the 7th and 9th frets
+        note_options = fretboard.get_note_options([Note(40), Note(68), Note(57), Note(54)])
+        positions = [tuple(fretboard.G.nodes[note]["pos"] for note in fingering) 
+                     for fingering in fretboard.get_possible_fingerings(note_options)]
+        
+        self.assertEqual(positions, [((0, 4), (2, 2), (3, 4), (5, 0))])
+        
+        self.assertEqual(fretboard.get_possible_fingerings([]), [])
     
     def test_is_path_possible(self):
         pass
@@ -76,22 +117,74 @@ class TestGraphUtils(unittest.TestCase):
         pass
     
     def test_get_path_length(self):
-        pass
+        fretboard = Fretboard(Tuning())
+        note_options = fretboard.get_note_options([Note(45), Note(52), Note(57)])
+        path = fretboard.get_possible_fingerings(note_options)[0]
+        
+        expected_length = sum(fretboard.G[path[i]][path[i+1]]["distance"] for i in range(len(path)-1))/10
+        
+        self.assertAlmostEqual(graph_utils.get_path_length(fretboard.G, path), expected_length, places=5)
+        self.assertAlmostEqual(graph_utils.get_path_length(fretboard.G, path, (fretboard.node_indices, fretboard.distances)), expected_length, places=5)
+        self.assertIsInstance(graph_utils.get_path_length(fretboard.G, path, (fretboard.node_indices, fretboard.distances)), float)
     
     def test_display_path_graph(self):
         pass
     
     def test_viterbi(self):
-        pass
+        Tm = np.array([
+            [0.9, 0.1],
+            [0.1, 0.9]
+        ])
+        Em = np.array([
+            [1.0, 0.0],
+            [0.0, 1.0]
+        ])
+        
+        self.assertEqual(list(graph_utils.viterbi([0, 0, 1, 1], Tm, Em)), [0, 0, 1, 1])
+        
+        Em = np.array([
+            [1.0, 0.0],
+            [1.0, 1.0]
+        ])
+        
+        self.assertEqual(list(graph_utils.viterbi([0, 1, 1, 0], Tm, Em)), [1, 1, 1, 1])
+        
+        log_Tm, log_Em = np.log(Tm), np.log(Em)
+        self.assertEqual(list(graph_utils.viterbi([0, 1, 1, 0], Tm, Em, log_Tm=log_Tm, log_Em=log_Em)), [1, 1, 1, 1])
     
     def test_build_transition_matrix(self):
-        pass
+        fretboard = Fretboard(Tuning())
+        weights = {"b":1, "height":1, "length":1, "n_changed_strings":1}
+        
+        fingerings = []
+        for pitches in ([52], [55, 59], [48, 52, 55]):
+            note_options = fretboard.get_note_options([Note(pitch) for pitch in pitches])
+            fingerings += fretboard.get_possible_fingerings(note_options)
+        
+        transition_matrix = graph_utils.build_transition_matrix(fretboard.G, fingerings, weights, fretboard.tuning)
+        
+        self.assertEqual(transition_matrix.shape, (len(fingerings), len(fingerings)))
+        np.testing.assert_allclose(transition_matrix.sum(axis=1), 1)
+        np.testing.assert_allclose(graph_utils.build_transition_matrix(fretboard.G, fingerings, weights, fretboard.tuning, block_size=2), transition_matrix)
+        
+        for iprevious, previous in enumerate(fingerings):
+            easinesses = [1/graph_utils.compute_path_difficulty(fretboard.G, current, previous, weights, fretboard.tuning) for current in fingerings]
+            np.testing.assert_allclose(transition_matrix[iprevious], graph_utils.difficulties_to_probabilities(easinesses))
     
     def test_difficulties_to_probabilities(self):
         pass
     
     def test_expand_emission_matrix(self):
-        pass
+        emission_matrix = np.array([])
+        builder = graph_utils.EmissionMatrixBuilder(nrows=2, ncols=1)
+        
+        for npaths in (3, 1, 4, 2):
+            emission_matrix = graph_utils.expand_emission_matrix(emission_matrix, [None] * npaths)
+            builder.expand([None] * npaths)
+            
+            np.testing.assert_array_equal(builder.matrix, emission_matrix)
+            
+        self.assertEqual(builder.matrix.shape, (10, 4))
     
     def test_display_notes_on_graph(self):
         pass
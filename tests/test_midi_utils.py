@@ -53,6 +53,13 @@ class TestMidiUtils(unittest.TestCase):
             midi_utils.get_notes_between(midi, notes, midi.time_to_tick(-1), midi.time_to_tick(2.51)),
             [notes[0], notes[1], notes[2]]
         )
+        
+        notes_index = midi_utils.index_notes_by_tick(midi, notes[::-1])
+        
+        self.assertEqual(
+            midi_utils.get_notes_between(midi, notes, midi.time_to_tick(1), midi.time_to_tick(3), notes_index),
+            [notes[1], notes[2]]
+        )
     
     def test_get_non_drum(self):
         instruments = [
@@ -101,6 +108,10 @@ class TestMidiUtils(unittest.TestCase):
         
         self.assertEqual(midi_utils.sort_notes_by_tick(notes), notes)
         
+        unsorted_notes = [notes[3], notes[1], notes[0], notes[2]]
+        midi_utils.sort_notes_by_tick_inplace(unsorted_notes)
+        self.assertEqual(unsorted_notes, notes)
+        
     def test_round_to_multiple(self):
         base = 5
         
@@ -114,4 +125,19 @@ class TestMidiUtils(unittest.TestCase):
         self.assertEqual(midi_utils.round_to_multiple(to_round, base), -5)
         
     def test_quantize(self):
-        pass
\ No newline at end of file
+        midi = pretty_midi.PrettyMIDI(resolution = 320) #Quantizes to multiples of 10 ticks
+        instrument = pretty_midi.Instrument(0)
+        
+        notes = [
+            pretty_midi.Note(velocity=100, pitch = 60, start = 0.01, end = 1),
+            pretty_midi.Note(velocity=100, pitch = 62, start = 0.1, end = 2),
+            pretty_midi.Note(velocity=100, pitch = 64, start = 0.5, end = 3)
+        ]
+        instrument.notes = list(notes)
+        midi.instruments.append(instrument)
+        
+        midi_utils.quantize(midi)
+        
+        self.assertEqual([midi.time_to_tick(note.start) for note in instrument.notes], [10, 60, 320])
+        self.assertEqual([note.end for note in instrument.notes], [1, 2, 3])
+        self.assertEqual([note.pitch for note in instrument.notes], [60, 62, 64])
\ No newline at end of file
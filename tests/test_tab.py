@@ -0,0 +1,28 @@
+import unittest
+import pretty_midi
+
+from tuttut.logic.tab import Tab
+from tuttut.logic.theory import Tuning
+
+class TestTab(unittest.TestCase):
+    def setUp(self):
+        pass
+    
+    def tearDown(self):
+        pass
+    
+    def test_repeated_chords_share_observation(self):
+        midi = pretty_midi.PrettyMIDI(resolution = 220)
+        instrument = pretty_midi.Instrument(0)
+        
+        #Same chord with its notes in different orders (set iteration order depends on it), then another chord
+        for start, pitches in ((0, (72, 67, 64)), (1, (64, 67, 72)), (2, (67, 72, 64)), (3, (60, 64))):
+            for pitch in pitches:
+                instrument.notes.append(pretty_midi.Note(velocity=100, pitch=pitch, start=start, end=start+1))
+        
+        midi.instruments.append(instrument)
+        
+        tab = Tab("test", Tuning(), midi)
+        
+        self.assertEqual(len(tab.notes_vocabulary), 2)
+        self.assertEqual(tab.notes_sequence, [0, 0, 0, 1])
@@ -15,6 +15,9 @@ class Fretboard:
         self.nstrings = tuning.nstrings
         self.scale_length = 650
         self.G = self._build_complete_graph()
+        self.positions = nx.get_node_attributes(self.G, "pos")
+        self.node_indices, self.distances = precompute_distance_matrix(self.G)
+        self.nodes_by_pitch = self._build_nodes_by_pitch()
 
     def _build_complete_graph(self):
         """Builds the complete graph representing the fretboard.
@@ -32,15 +35,34 @@ class Fretboard:
             for inote, note in enumerate(string):
                 complete_graph.add_node(note, pos = (istring, inote))
 
-        complete_graph_nodes = list(complete_graph.nodes(data=True))
+        nodes = list(complete_graph.nodes)
+        positions = np.array([complete_graph.nodes[node]["pos"] for node in nodes], dtype=float)
+        
+        #All the distances at once, row i being the source node and column j the target node
+        distances = self.distance_between_arr(positions[:, None, :], positions[None, :, :])
+        #Edges are undirected, the link from an earlier node to an open string gets overwritten by the reverse one
+        distances[positions[:, 1] == 0, :] = 0
+        distances = distances.tolist()
 
-        for node in complete_graph_nodes:
-            for node_to_link in complete_graph_nodes:
-                dst = 0 if node_to_link[1]['pos'][1] == 0 else self.distance_between(node[1]['pos'], node_to_link[1]['pos'])
-                complete_graph.add_edge(node[0], node_to_link[0], distance = dst)
+        complete_graph.add_edges_from((nodes[i], nodes[j], {"distance": distances[i][j]}) 
+                                      for i in range(len(nodes)) for j in range(i, len(nodes)))
             
         return complete_graph
     
+    def _build_nodes_by_pitch(self):
+        """Groups the nodes of the fretboard graph by pitch.
+        
+        Notes are hashed by identity but compared by pitch, so nodes playing a note can't be found with a lookup in the graph.
+
+        Returns:
+            dict: List of nodes for each pitch, in graph order
+        """
+        nodes_by_pitch = defaultdict(list)
+        for node in self.G.nodes:
+            nodes_by_pitch[node.pitch].append(node)
+            
+        return dict(nodes_by_pitch)
+    
     def get_note_options(self, notes):
         """Returns note arrays from a list of theory.Notes"""
         note_options =[self.get_specific_note_options(note) for note in notes]
@@ -57,36 +79,66 @@ class Fretboard:
         Returns:
             list: List of nodes thar play the specified note
         """
-        nodes = list(self.G.nodes)
-
-        return [node for node in nodes if node == note]
+        return list(self.nodes_by_pitch.get(note.pitch, []))
     
     def get_possible_fingerings(self, note_options): 
-        """Returns all possible fingerings in a path graph
+        """Returns all possible fingerings for a set of note options.
+        
+        A fingering picks one position per note. Positions are picked note by note with a depth-first search,
+        and branches that put two notes on one string or span too many frets are pruned right away.
+        Notes in a fingering are ordered by string.
 
         Args:
-            G (networkx.Graph): Fretboard graph
-            note_arrays (list): List of possible positions for the notes
+            note_options (list): List of possible positions for the notes
 
         Returns:
-            list: List of paths
+            list: List of fingerings
         """
         fingerings = []
         
+        if len(note_options) == 0:
+            return []
+        
         if len(note_options) == 1:
             return [(note,) for note in note_options[0]]
 
-        for note_options_permutation in list(itertools.permutations(note_options)):
-            path_graph = build_path_graph(self.G, note_options_permutation)
-            # display_path_graph(path_graph)
-            for possible_source_node in note_options_permutation[0]:
-                permutation_fingerings = nx.all_simple_paths(path_graph, possible_source_node, target=note_options_permutation[-1])
-                for fingering in permutation_fingerings:
-                    if not is_path_already_checked(fingerings, fingering) and self.is_fingering_possible(fingering, note_options_permutation):
-                        fingerings.append(tuple(fingering))
+        stack = [()]
+        while len(stack) > 0:
+            fingering = stack.pop()
+            
+            if len(fingering) == len(note_options):
+                if self.is_fingering_possible(fingering, note_options):
+                    fingerings.append(tuple(sorted(fingering, key=lambda note: self.positions[note][0])))
+                continue
+            
+            #Reversed so that fingerings come out in the same order as itertools.product
+            for possible_note in reversed(note_options[len(fingering)]):
+                if self.can_add_to_fingering(fingering, possible_note):
+                    stack.append(fingering + (possible_note,))
                     
         return fingerings
     
+    def can_add_to_fingering(self, fingering, possible_note):
+        """Checks if a note can be added to a partial fingering.
+
+        Args:
+            fingering (tuple): Notes already in the fingering
+            possible_note (Note): Note to add
+
+        Returns:
+            bool: If the note is on a free string and keeps the fret span under 5
+        """
+        istring, ifret = self.positions[possible_note]
+        
+        for note in fingering:
+            note_istring, note_ifret = self.positions[note]
+            if note_istring == istring:
+                return False
+            if ifret != 0 and note_ifret != 0 and abs(ifret - note_ifret) >= 5:
+                return False
+            
+        return True
+    
     def fix_oob_notes(self, notes, preserve_highest_note = False):
         min_possible_pitch, max_possible_pitch = self.tuning.get_pitch_bounds()
         
@@ -134,28 +186,32 @@ class Fretboard:
         Returns:
             float: Distance between the two points
         """
-        p1 = (p1[0]/self.nstrings, p1[1])
-        p2 = (p2[0]/self.nstrings, p2[1])
-        return math.dist(p1,p2)
+        return math.hypot((p1[0] - p2[0])/self.nstrings, p1[1] - p2[1])
+    
+    def distance_between_arr(self, p1s, p2s):
+        """Computes the distances between arrays of points on the fretboard, see distance_between.
+
+        Args:
+            p1s (np.ndarray): Source points, last axis being (string, fret)
+            p2s (np.ndarray): Destination points, broadcastable against p1s
+
+        Returns:
+            np.ndarray: Distances between the points
+        """
+        return np.hypot((p1s[..., 0] - p2s[..., 0])/self.nstrings, p1s[..., 1] - p2s[..., 1])
     
     def get_fret_distance(self, nfret):
         """Returns the distance of the fret from the nut.
+        
+        Each fret takes 1/17.817 of the remaining scale length, which sums up to a geometric series.
 
         Args:
-            nfret (int): Number of the fret
+            nfret (int or np.ndarray): Number of the fret, or array of fret numbers
 
         Returns:
-            float: Distance of the fret from the nut
+            float or np.ndarray: Distance of the fret from the nut
         """
-        res = 0
-        remaining_scale_length = self.scale_length
-        
-        for _ in range(nfret):
-            fret_height = remaining_scale_length / 17.817
-            res += fret_height
-            remaining_scale_length -= fret_height
-            
-        return res
+        return self.scale_length * (1 - (16.817/17.817)**nfret)
     
     def is_edge_possible(self, possible_note, possible_target_note):
         """Checks if a connection is possible between 2 nodes
@@ -163,14 +219,22 @@ class Fretboard:
         Args:
             possible_note (Note): Source note
             possible_target_note (Note): Target note
-            G (networkx.Graph): Fretboard graph
 
         Returns:
             bool: Possibility of the connection
         """
-        is_distance_possible = self.G[possible_note][possible_target_note]["distance"] < 6
-        is_different_string = self.G.nodes[possible_note]["pos"][0] != self.G.nodes[possible_target_note]["pos"][0]
-        return is_distance_possible and is_different_string
+        istring, ifret = self.positions[possible_note]
+        target_istring, target_ifret = self.positions[possible_target_note]
+        
+        #Cheap checks first
+        if istring == target_istring:
+            return False
+        
+        #The distance between two fretted notes is at least their fret difference
+        if ifret != 0 and target_ifret != 0 and abs(ifret - target_ifret) >= 6:
+            return False
+        
+        return self.distances[self.node_indices[possible_note], self.node_indices[possible_target_note]] < 6
     
     def is_fingering_possible(self, fingering, note_arrays):
         """Checks if path is possible and playable.
@@ -184,17 +248,23 @@ class Fretboard:
             bool: If the path is possible and playable
         """
         #No 2 fingers on a single string
-        plucked_strings = [self.G.nodes[note]["pos"][0] for note in fingering]
+        plucked_strings = [self.positions[note][0] for note in fingering]
         one_per_string = len(plucked_strings) == len(set(plucked_strings))
 
         #No more than 5 fret span
-        used_frets = [self.G.nodes[note]["pos"][1] for note in fingering if self.G.nodes[note]["pos"][1] != 0]
+        used_frets = [self.positions[note][1] for note in fingering if self.positions[note][1] != 0]
         max_fret_span = (max(used_frets) - min(used_frets)) < 5 if len(used_frets) > 0 else True
 
+        #Open strings reachable from the fretted notes (fretted notes are always reachable from each other)
+        open_notes = [note for note in fingering if self.positions[note][1] == 0]
+        fretted_notes = [note for note in fingering if self.positions[note][1] != 0]
+        is_connected = len(open_notes) == 0 or len(fretted_notes) == 0 or any(self.is_edge_possible(open_note, fretted_note) 
+                                                                              for open_note in open_notes for fretted_note in fretted_notes)
+
         #Path doesn't visit more nodes than necessary
         right_length = len(fingering) <= len(note_arrays)
 
-        return one_per_string and max_fret_span and right_length
+        return one_per_string and max_fret_span and is_connected and right_length
     
     def display_fingering_on_graph(self, fingering):
         """Displays notes played on a plt graph.
@@ -2,21 +2,58 @@ import numpy as np
 import math
 import networkx as nx
 import matplotlib.pyplot as plt
-import itertools
 
 from tuttut.logic.theory import *
 
-def build_path_graph(G, note_arrays):
+def precompute_distance_matrix(G):
+  """Returns the distances between all the nodes of a graph as a dense matrix.
+
+  Args:
+      G (networkx.Graph): Fretboard graph
+
+  Returns:
+      tuple: Index of every node in the matrix, distance matrix
+  """
+  idx_of = {node: i for i, node in enumerate(G.nodes)}
+  D = np.zeros((len(idx_of), len(idx_of)), dtype=np.float32)
+
+  for u, v, distance in G.edges(data="distance"):
+    D[idx_of[u], idx_of[v]] = distance
+    D[idx_of[v], idx_of[u]] = distance
+
+  return idx_of, D
+
+def get_distance(G, note, target_note, distance_matrix=None):
+  """Returns the distance between two nodes of the fretboard graph.
+
+  Args:
+      G (networkx.Graph): Fretboard graph
+      note (Note): Source note
+      target_note (Note): Target note
+      distance_matrix (tuple, optional): Output of precompute_distance_matrix for G. Read from G if None.
+
+  Returns:
+      float: Distance between the notes
+  """
+  if distance_matrix is None:
+    return G[note][target_note]["distance"]
+  
+  idx_of, D = distance_matrix
+  return float(D[idx_of[note], idx_of[target_note]])
+
+def build_path_graph(G, note_arrays, distance_matrix=None):
   """Returns a path graph corresponding to all possible notes of a chord.
 
   Args:
       G (networkx.Graph): Fretboard graph
       note_arrays (list): List of possible positions for the notes
+      distance_matrix (tuple, optional): Output of precompute_distance_matrix for G. Distances are read from G if None.
 
   Returns:
       networkx.DiGraph: Path graph for all possible position
   """
   res = nx.DiGraph()
+  pos = nx.get_node_attributes(G, "pos")
 
   for x, note_array in enumerate(note_arrays):
     for y, possible_note in enumerate(note_array):
@@ -25,42 +62,37 @@ def build_path_graph(G, note_arrays):
   for idx, note_array in enumerate(note_arrays[:-1]): #Go through every array except the last
     for possible_note in note_array:
       for possible_target_note in note_arrays[idx+1]:
-        distance = G[possible_note][possible_target_note]["distance"]
-        if is_edge_possible(possible_note, possible_target_note, G):
+        if is_edge_possible(possible_note, possible_target_note, G, pos, distance_matrix):
+          distance = get_distance(G, possible_note, possible_target_note, distance_matrix)
           res.add_edge(possible_note, possible_target_note, distance = distance)
 
   return res 
 
-def is_edge_possible(possible_note, possible_target_note, G): ####### Should be in Fretboard but is used by build_path_graph
+def is_edge_possible(possible_note, possible_target_note, G, pos, distance_matrix=None): ####### Should be in Fretboard but is used by build_path_graph
   """Checks if a connection is possible between 2 nodes
 
   Args:
       possible_note (Note): Source note
       possible_target_note (Note): Target note
       G (networkx.Graph): Fretboard graph
+      pos (dict): Positions of the nodes of the fretboard graph
+      distance_matrix (tuple, optional): Output of precompute_distance_matrix for G. Distances are read from G if None.
 
   Returns:
       bool: Possibility of the connection
   """
-  is_distance_possible = G[possible_note][possible_target_note]["distance"] < 6
-  is_different_string = G.nodes[possible_note]["pos"][0] != G.nodes[possible_target_note]["pos"][0]
-  return is_distance_possible and is_different_string
-
-def is_path_already_checked(paths, current_path):
-  """Checks if paths is already present in explored paths, whatever the order. 
-
-  Args:
-      paths (list): List of paths that have been already explored
-      current_path (tuple): Path to check
-
-  Returns:
-      bool: If the path has already been checked
-  """
-  for path in paths:
-    if set(path) == set(current_path):
-      return True
+  istring, ifret = pos[possible_note]
+  target_istring, target_ifret = pos[possible_target_note]
   
-  return False
+  #Cheap checks first
+  if istring == target_istring:
+    return False
+  
+  #The distance between two fretted notes is at least their fret difference
+  if ifret != 0 and target_ifret != 0 and abs(ifret - target_ifret) >= 6:
+    return False
+  
+  return get_distance(G, possible_note, possible_target_note, distance_matrix) < 6
 
 def compute_path_difficulty(G, path, previous_path, weights, tuning):
   """Computes the difficulty of a path.
@@ -121,6 +153,19 @@ def laplace_distro(x, b, mu=0.0):
   """
   return (1/(2*b))*math.exp(-abs(x-mu)/(b))
 
+def laplace_distro_array(x, b, mu=0.0):
+  """Returns the y values for an array of x on a laplace distribution.
+
+  Args:
+      x (np.ndarray): X values
+      b (float): b parameter for Laplace distribution
+      mu (float, optional): mu parameter for Laplace distribution. Defaults to 0.
+
+  Returns:
+      np.ndarray: Y values
+  """
+  return (1/(2*b))*np.exp(-np.abs(x-mu)/(b))
+
 def get_nfingers(G, path):
   """Returns the number of fingers needed for a path.
 
@@ -176,7 +221,7 @@ def get_height_score(G, path, tuning, previous_path=None):
   """
   height = get_raw_height(G, path, previous_path)/tuning.nfrets
   assert 0 <= height <= 1
-  return get_raw_height(G, path, previous_path)/tuning.nfrets
+  return height
     
 def get_raw_height(G, path, previous_path=None):
   """Returns the average height on the fretboard of highest and lowest notes in the path.
@@ -210,7 +255,7 @@ def get_dheight_score(height, previous_height, tuning):
   assert 0 <= dheight <= 1
   return dheight
     
-def get_path_length(G, path):
+def get_path_length(G, path, distance_matrix=None):
   """Returns the total length of a path.
   
   Corresponds to the sum of all the distances between the notes.
@@ -218,13 +263,17 @@ def get_path_length(G, path):
   Args:
       G (networkx.Graph): Fretboard graph
       path (tuple): Path to compute the length for
+      distance_matrix (tuple, optional): Output of precompute_distance_matrix for G. Distances are read from G if None.
 
   Returns:
       float: Length of the path
   """
-  res = 0
-  for i in range(len(path)-1):
-    res += G[path[i]][path[i+1]]["distance"]
+  if distance_matrix is None:
+    res = sum(G[path[i]][path[i+1]]["distance"] for i in range(len(path)-1))
+  else:
+    idx_of, D = distance_matrix
+    ix = np.array([idx_of[note] for note in path], dtype=int)
+    res = float(D[ix[:-1], ix[1:]].sum())
     
   length = res/10 #10 probably the maximum distance between notes
   assert 0 <= length <= 1
@@ -267,7 +316,7 @@ def display_path_graph(path_graph, show_distances=True, show_names=True):
 
   plt.show()
   
-def viterbi(V, Tm, Em, initial_distribution = None):
+def viterbi(V, Tm, Em, initial_distribution = None, log_Tm = None, log_Em = None):
   """Implementation of the Viterbi algorithm.
 
   Args:
@@ -275,6 +324,8 @@ def viterbi(V, Tm, Em, initial_distribution = None):
       Tm (np.ndarray): Transition matrix
       Em (np.ndarray): Emission matrix
       initial_distribution (list, optional): Initial distribution. Defaults to None.
+      log_Tm (np.ndarray, optional): Precomputed np.log(Tm), to reuse across calls with the same matrices. Defaults to None.
+      log_Em (np.ndarray, optional): Precomputed np.log(Em), to reuse across calls with the same matrices. Defaults to None.
 
   Returns:
       list: The most likely sequence of hidden states 
@@ -284,57 +335,130 @@ def viterbi(V, Tm, Em, initial_distribution = None):
 
   initial_distribution = initial_distribution if initial_distribution is not None else np.full(M, 1/M)
 
+  log_Tm = np.log(Tm) if log_Tm is None else log_Tm
+  log_Em = np.log(Em) if log_Em is None else log_Em
+
   omega = np.zeros((T, M))
   omega[0, :] = np.log(initial_distribution * Em[:, V[0]])
 
-  prev = np.zeros((T - 1, M))
+  prev = np.zeros((T - 1, M), dtype=np.int64)
 
   for t in range(1, T):
-      for j in range(M):
-          # Same as Forward Probability
-          probability = omega[t - 1] + np.log(Tm[:, j]) + np.log(Em[j, V[t]])
+      # Same as Forward Probability, for every (previous, current) pair of states at once
+      probability = omega[t - 1, :, None] + log_Tm + log_Em[:, V[t]][None, :]
 
-          # This is our most probable state given previous state at time t (1)
-          prev[t - 1, j] = np.argmax(probability)
+      # This is our most probable state given previous state at time t (1)
+      prev[t - 1] = np.argmax(probability, axis=0)
 
-          # This is the probability of the most probable state (2)
-          omega[t, j] = np.max(probability)
+      # This is the probability of the most probable state (2)
+      omega[t] = np.max(probability, axis=0)
 
   # Path Array
-  S = np.zeros(T)
+  S = np.empty(T, dtype=np.int64)
 
   # Find the most probable last hidden state
-  last_state = np.argmax(omega[T - 1, :])
+  S[-1] = np.argmax(omega[-1])
 
-  S[0] = last_state
-
-  backtrack_index = 1
+  # Backtrack from the last state
   for i in range(T - 2, -1, -1):
-      S[backtrack_index] = prev[i, int(last_state)]
-      last_state = prev[i, int(last_state)]
-      backtrack_index += 1
+      S[i] = prev[i, S[i + 1]]
+
+  return S
+
+def _featurize(G, fingerings, tuning):
+  """Extracts the per-fingering features used to compute transition difficulties.
+
+  Args:
+      G (networkx.Graph): Fretboard graph
+      fingerings (list): All the fingerings that can be used to play a piece.
+      tuning (Tuning): Tuning of the instrument
+
+  Returns:
+      tuple: Raw heights, whether each fingering has fretted notes, spans, number of notes,
+      used strings and fretted strings (boolean matrices of shape (F, nstrings))
+  """
+  nfingerings = len(fingerings)
+  raw_heights = np.zeros(nfingerings)
+  is_fretted = np.zeros(nfingerings, dtype=bool)
+  spans = np.zeros(nfingerings)
+  lengths = np.zeros(nfingerings)
+  used_strings = np.zeros((nfingerings, tuning.nstrings), dtype=bool)
+  fretted_strings = np.zeros((nfingerings, tuning.nstrings), dtype=bool)
+
+  pos = nx.get_node_attributes(G, "pos")
+
+  for ifingering, fingering in enumerate(fingerings):
+    positions = [pos[note] for note in fingering]
+    y = [ifret for _, ifret in positions if ifret != 0]
+
+    if len(y) > 0:
+      raw_heights[ifingering] = (max(y) + min(y))/2
+      spans[ifingering] = (max(y) - min(y))/5
+      is_fretted[ifingering] = True
+
+    lengths[ifingering] = len(fingering)
 
-  # Flip the path array since we were backtracking
-  S = np.flip(S, axis=0)
+    for istring, ifret in positions:
+      used_strings[ifingering, istring] = True
+      if ifret != 0:
+        fretted_strings[ifingering, istring] = True
 
-  return S.astype(int)
+  return raw_heights, is_fretted, spans, lengths, used_strings, fretted_strings
 
-def build_transition_matrix(G, fingerings, weights, tuning):
+def build_transition_matrix(G, fingerings, weights, tuning, block_size=256):
   """Builds the transition matrix according to all the present fingerings.
+  
+  Equivalent to computing compute_path_difficulty for every (previous, current) pair of fingerings,
+  but done on blocks of rows at once so that temporaries stay small next to the matrix itself.
 
   Args:
       G (networkx.Graph): Fretboard graph
       fingerings (list): All the fingerings that can be used to play a piece.
+      block_size (int, optional): Number of rows computed at once. Defaults to 256.
 
   Returns:
       np.ndarray: Transition matrix
   """
-  transition_matrix = np.zeros((len(fingerings), len(fingerings)))
-  for iprevious in range(len(fingerings)):
-    difficulties = np.array([1/compute_path_difficulty(G, fingerings[icurrent], fingerings[iprevious], weights, tuning)
-                            for icurrent in range(len(fingerings))])
+  raw_heights, is_fretted, spans, lengths, used_strings, fretted_strings = _featurize(G, fingerings, tuning)
+  
+  # Heights are multiples of half a fret, so the Laplace term only takes 2*nfrets+1 values
+  laplace_table = laplace_distro_array(np.arange(2*tuning.nfrets + 1)/(2*tuning.nfrets), b=weights["b"])
+  span_factors = 1/(1+spans * weights["length"])
+  used_strings = used_strings.T.astype(int)
+  fretted_strings = fretted_strings.astype(int)
+  
+  # Rows are previous fingerings, columns are current fingerings
+  transition_matrix = np.empty((len(fingerings), len(fingerings)))
+  
+  for start in range(0, len(fingerings), block_size):
+    easiness = transition_matrix[start:start + block_size]
+    previous_raw_heights = raw_heights[start:start + block_size, None]
     
-    transition_matrix[iprevious] = difficulties_to_probabilities(difficulties)
+    # A fingering with no fretted notes keeps the height of the previous one
+    current_raw_heights = np.where(is_fretted[None, :], raw_heights[None, :], previous_raw_heights)
+    
+    dheight_steps = np.abs(current_raw_heights - previous_raw_heights)
+    dheight_steps *= 2
+    np.take(laplace_table, np.rint(dheight_steps).astype(int), out=easiness)
+    
+    # Height factor, reusing the raw heights buffer
+    current_raw_heights /= tuning.nfrets
+    current_raw_heights *= weights["height"]
+    current_raw_heights += 1
+    np.reciprocal(current_raw_heights, out=current_raw_heights)
+    easiness *= current_raw_heights
+    
+    easiness *= span_factors[None, :]
+    
+    # Changed strings factor, reusing the Laplace steps buffer
+    n_changed_strings = np.subtract(lengths[None, :], fretted_strings[start:start + block_size] @ used_strings, out=dheight_steps)
+    n_changed_strings /= tuning.nstrings
+    n_changed_strings *= weights["n_changed_strings"]
+    n_changed_strings += 1
+    np.reciprocal(n_changed_strings, out=n_changed_strings)
+    easiness *= n_changed_strings
+    
+    easiness /= np.sum(easiness, axis=1, keepdims=True)
   
   return transition_matrix
 
@@ -369,4 +493,52 @@ def expand_emission_matrix(emission_matrix, all_paths):
     emission_matrix = np.vstack((np.ones(len(all_paths))))
 
   return emission_matrix
+
+class EmissionMatrixBuilder:
+  """Emission matrix that grows as new notes come by.
   
+  The underlying array is over-allocated and doubled when full, so expanding only writes the new block
+  instead of copying the whole matrix every time.
+  """
+  def __init__(self, nrows = 64, ncols = 16):
+    """Constructor for the EmissionMatrixBuilder object.
+
+    Args:
+        nrows (int, optional): Initial number of allocated rows (fingerings). Defaults to 64.
+        ncols (int, optional): Initial number of allocated columns (observations). Defaults to 16.
+    """
+    self.data = np.zeros((nrows, ncols))
+    self.rows_used = 0
+    self.cols_used = 0
+
+  def expand(self, all_paths):
+    """Expands the emission matrix with a new observation played by all_paths.
+
+    Args:
+        all_paths (list): All current paths
+    """
+    nrows = max(self.data.shape[0], 1)
+    while self.rows_used + len(all_paths) > nrows:
+      nrows *= 2
+      
+    ncols = max(self.data.shape[1], 1)
+    while self.cols_used + 1 > ncols:
+      ncols *= 2
+    
+    if (nrows, ncols) != self.data.shape:
+      data = np.zeros((nrows, ncols))
+      data[:self.rows_used, :self.cols_used] = self.matrix
+      self.data = data
+    
+    self.data[self.rows_used:self.rows_used + len(all_paths), self.cols_used] = 1.0
+    self.rows_used += len(all_paths)
+    self.cols_used += 1
+
+  @property
+  def matrix(self):
+    """Returns the emission matrix.
+
+    Returns:
+        np.ndarray: View of the used part of the emission matrix
+    """
+    return self.data[:self.rows_used, :self.cols_used]
@@ -1,3 +1,5 @@
+import operator
+import numpy as np
 import pretty_midi
 import tuttut.logic.theory as theory
 # from app.graph_utils import 
@@ -16,7 +18,23 @@ def measure_length_ticks(midi, time_signature):
   measure_length = n_quarter_notes * midi.resolution 
   return measure_length
 
-def get_notes_between(midi, notes, begin, end):
+def index_notes_by_tick(midi, notes):
+  """Sorts notes by start time and returns their start ticks.
+  
+  Build it once and pass it to get_notes_between when querying the same notes for every measure.
+
+  Args:
+      midi (pretty_midi.PrettyMIDI): MIDI object
+      notes (list): Notes to index
+
+  Returns:
+      tuple: Sorted notes, array of their start ticks
+  """
+  sorted_notes = sort_notes_by_tick(notes)
+  tick_array = np.array([midi.time_to_tick(note.start) for note in sorted_notes], dtype=np.int64)
+  return sorted_notes, tick_array
+
+def get_notes_between(midi, notes, begin, end, notes_index=None):
   """Return all notes between two specific timings in a midi file.
 
   Args:
@@ -24,17 +42,26 @@ def get_notes_between(midi, notes, begin, end):
       notes (list): Notes to search in
       begin (int): Timing of the lower bound in ticks
       end (int): Timing of the upper bound in ticks
+      notes_index (tuple, optional): Output of index_notes_by_tick for these notes. 
+          When given, the notes are found with a binary search instead of a scan. Defaults to None.
 
   Returns:
       list: Notes between the lower and upper bounds
   """
-  res = []
-  for note in notes:
-    note_start_ticks = midi.time_to_tick(note.start)
-    if note_start_ticks >= begin and note_start_ticks < end:
-      res.append(note)
-
-  return res
+  if notes_index is None:
+    res = []
+    for note in notes:
+      note_start_ticks = midi.time_to_tick(note.start)
+      if note_start_ticks >= begin and note_start_ticks < end:
+        res.append(note)
+
+    return res
+  
+  sorted_notes, tick_array = notes_index
+  
+  lo = np.searchsorted(tick_array, begin, side="left")
+  hi = np.searchsorted(tick_array, end, side="left")
+  return sorted_notes[lo:hi]
 
 def get_non_drum(instruments):
   """Returns all instruments that are non-drums.
@@ -71,7 +98,15 @@ def sort_notes_by_tick(notes):
   Returns:
       list: New sorted list of notes
   """
-  return sorted(notes, key = lambda n: n.start)
+  return sorted(notes, key = operator.attrgetter("start"))
+
+def sort_notes_by_tick_inplace(notes):
+  """Sorts notes by tick in place.
+
+  Args:
+      notes (list): List of notes to sort 
+  """
+  notes.sort(key = operator.attrgetter("start"))
   
 def round_to_multiple(n, base=10):
   """Rounds a number to the closest multiple of a base.
@@ -92,14 +127,17 @@ def quantize(midi):
       midi (pretty_midi.PrettyMIDI): MIDI object to quantize
   """
   quantization_factor = 32
+  base = midi.resolution/quantization_factor
   
   for instrument in midi.instruments:
-      quantized_notes = []
-      for note in instrument.notes:
-          rounded = round_to_multiple(midi.time_to_tick(note.start), base=midi.resolution/quantization_factor)
-          quantized_notes.append(pretty_midi.Note(velocity = note.velocity, pitch = note.pitch, start = midi.tick_to_time(rounded), end=note.end))
-
-      instrument.notes = quantized_notes
+      if len(instrument.notes) == 0:
+          continue
+      
+      ticks = np.fromiter((midi.time_to_tick(note.start) for note in instrument.notes), dtype=np.float64, count=len(instrument.notes))
+      rounded_ticks = (base * np.round(ticks/base)).astype(np.int64) #Same as round_to_multiple on every note
+      
+      for note, rounded in zip(instrument.notes, rounded_ticks.tolist()):
+          note.start = midi.tick_to_time(rounded)
       
 def transpose_note(note, semitones):
     return theory.Note(note.pitch + semitones)
@@ -115,7 +153,7 @@ def remove_duplicate_notes(notes):
   return res_notes
 
 def sort_notes_by_pitch(notes):
-  return sorted(notes, key = lambda n: n.pitch)
+  return sorted(notes, key = operator.attrgetter("pitch"))
 
 def get_events_between(timeline, start_ticks, end_ticks):
     return {key: timeline[key] for key in timeline.keys() if start_ticks <= key < end_ticks}
\ No newline at end of file
@@ -61,7 +61,7 @@ class Tab:
     #Notes
     for instrument in non_drum_instruments:
       notes = instrument.notes
-      notes.sort(key=lambda x: x.start)
+      sort_notes_by_tick_inplace(notes)
       
       assert [note.start for note in notes] == sorted([note.start for note in notes]) #Are notes sorted by time
       
@@ -89,12 +89,12 @@ class Tab:
     
     tab["measures"] = []
 
-    notes_vocabulary = []
+    notes_vocabulary = {} #Set of pitches -> observation index
     notes_sequence = []
     
     fingerings_vocabulary = []
 
-    emission_matrix = np.array([])
+    emission_matrix = EmissionMatrixBuilder()
     initial_probabilities = None
     
 
@@ -119,7 +119,7 @@ class Tab:
           
           notes = event_types["notes"]
           
-          notes_pitches = tuple(set([note.pitch for note in notes]))
+          notes_pitches = frozenset(note.pitch for note in notes)
           notes = [Note(pitch) for pitch in notes_pitches]
           
           notes = self.fretboard.fix_oob_notes(notes, preserve_highest_note=False)
@@ -130,7 +130,7 @@ class Tab:
             fingering_options = self.fretboard.get_possible_fingerings(note_options)
             
             if len(fingering_options) > 0:   
-              notes_vocabulary.append(notes_pitches)
+              notes_vocabulary[notes_pitches] = len(notes_vocabulary)
               
               fingerings_vocabulary += fingering_options 
                             
@@ -138,10 +138,10 @@ class Tab:
                 isolated_difficulties = [compute_isolated_path_difficulty(self.fretboard.G, path, self.tuning) for path in fingering_options]
                 initial_probabilities = difficulties_to_probabilities(isolated_difficulties)
               
-              emission_matrix = expand_emission_matrix(emission_matrix, fingering_options)
+              emission_matrix.expand(fingering_options)
             
           if notes_pitches in notes_vocabulary:
-            notes_sequence.append(notes_vocabulary.index(notes_pitches))
+            notes_sequence.append(notes_vocabulary[notes_pitches])
           else:
             notes_sequence.append(-1)
             
@@ -149,11 +149,14 @@ class Tab:
 
       tab["measures"].append(res_measure)
             
+    self.notes_vocabulary = notes_vocabulary
+    self.notes_sequence = notes_sequence
+    
     transition_matrix = build_transition_matrix(self.fretboard.G, fingerings_vocabulary, self.weights, self.tuning)
     
     initial_probabilities = np.hstack((initial_probabilities, np.zeros(len(transition_matrix) - len(initial_probabilities))))
     
-    sequence_indices = viterbi(notes_sequence, transition_matrix, emission_matrix, initial_probabilities)
+    sequence_indices = viterbi(notes_sequence, transition_matrix, emission_matrix.matrix, initial_probabilities)
 
     final_sequence = np.array(fingerings_vocabulary, dtype=object)[sequence_indices]
     
@@ -179,7 +182,7 @@ class Tab:
           continue
         
         for path_note in sequence[ievent]:
-          string, fret = self.fretboard.G.nodes[path_note]["pos"]   
+          string, fret = self.fretboard.positions[path_note]
           event["notes"].append({
             "degree": path_note.degree,
             "octave": path_note.octave,
@@ -3,6 +3,22 @@ import numpy as np
 import tuttut.logic.midi_utils as midi_utils
 from pretty_midi import note_number_to_name, note_name_to_number
 from collections import defaultdict
+from functools import lru_cache
+
+@lru_cache(maxsize=256)
+def note_number_to_note_name(pitch):
+  """Returns the name, degree and octave of a MIDI note number.
+  
+  Cached as Notes are created for every fret of every string and every note of the piece.
+
+  Args:
+      pitch (int): MIDI note number
+
+  Returns:
+      tuple: Name, degree and octave of the note
+  """
+  name = note_number_to_name(pitch)
+  return name, name[:-1], name[-1]
 
 class Note:
   """Note object."""
@@ -14,9 +30,7 @@ class Note:
     """
 
     self.pitch = pitch
-    self.name = note_number_to_name(pitch)
-    self.degree = self.name[:-1]
-    self.octave = self.name[-1]
+    self.name, self.degree, self.octave = note_number_to_note_name(pitch)
 
   def __eq__(self, other):
     """States the rules for whether or not 2 notes are equal.